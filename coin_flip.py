@@ -1,15 +1,9 @@
 import random
 
 def flip_coin(times):
-    heads_count = 0
-    tails_count = 0
-
-    for _ in range(times):
-        flip = random.choice(['Heads', 'Tails'])
-        if flip == 'Heads':
-            heads_count += 1
-        else:
-            tails_count += 1
+    # Each random bit is one flip, so count the set bits instead of looping
+    heads_count = bin(random.getrandbits(times)).count("1") if times > 0 else 0
+    tails_count = times - heads_count
 
     return heads_count, tails_count
 
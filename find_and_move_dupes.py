@@ -1,30 +1,70 @@
 import hashlib
+import mmap
 import os
 import shutil
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from tqdm import tqdm
 
-def get_file_hash(file_path, hash_algo='sha256'):
+try:
+    from blake3 import blake3
+    DEFAULT_HASH_ALGO = 'blake3'
+except ImportError:
+    blake3 = None
+    DEFAULT_HASH_ALGO = 'sha256'
+
+CHUNK_SIZE = 1024 * 1024  # 1 MiB reads to cut down on syscalls
+MMAP_LIMIT = 256 * 1024 * 1024  # Larger files are read in chunks instead of mapped
+
+def get_file_hash(file_path, hash_algo=DEFAULT_HASH_ALGO):
     """Calculate the hash of a file."""
-    hash_obj = hashlib.new(hash_algo)
-    with open(file_path, 'rb') as f:
-        while chunk := f.read(8192):
-            hash_obj.update(chunk)
+    hash_obj = blake3() if hash_algo == 'blake3' else hashlib.new(hash_algo)
+    with open(file_path, 'rb', buffering=0) as f:
+        file_size = os.fstat(f.fileno()).st_size
+        mapped = False
+        if 0 < file_size <= MMAP_LIMIT:
+            # Map the whole file and hash it with a single update call
+            try:
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                    if hasattr(mmap, 'MADV_SEQUENTIAL'):
+                        mm.madvise(mmap.MADV_SEQUENTIAL)
+                    hash_obj.update(mm)
+                mapped = True
+            except (OSError, ValueError):
+                # Some FUSE/network mounts and sysfs-style files can't be mapped
+                pass
+        if not mapped:
+            # Reuse one buffer instead of allocating a new bytes object per chunk
+            buffer = bytearray(CHUNK_SIZE)
+            view = memoryview(buffer)
+            while size := f.readinto(buffer):
+                hash_obj.update(view[:size])
     return hash_obj.hexdigest()
 
-def get_folder_hashes(folder_path, hash_algo='sha256'):
-    """Get a dictionary of file hashes for all files in a folder."""
-    file_hashes = {}
-    file_list = []
+def get_folder_sizes(folder_path):
+    """Get a dictionary of file sizes for all files in a folder."""
+    file_sizes = {}
 
-    # Collect all files in the folder
     for root, _, files in os.walk(folder_path):
         for file_name in files:
-            file_list.append(os.path.join(root, file_name))
+            file_path = os.path.join(root, file_name)
+            file_sizes[file_path] = os.path.getsize(file_path)
+
+    return file_sizes
+
+def get_folder_hashes(folder_path, file_sizes, candidate_sizes, hash_algo=DEFAULT_HASH_ALGO):
+    """Get a dictionary of file hashes for the files whose size is in candidate_sizes."""
+    file_hashes = {}
+
+    # Files with a size that doesn't appear in the other folder can't be duplicates
+    file_list = [path for path, size in file_sizes.items() if size in candidate_sizes]
     
-    # Iterate through the files with a progress bar
-    for file_path in tqdm(file_list, desc=f"Processing {folder_path}", unit="file"):
-        file_hash = get_file_hash(file_path, hash_algo)
-        file_hashes[file_path] = file_hash
+    # Hash the files in parallel; hashlib releases the GIL while hashing
+    with ThreadPoolExecutor(max_workers=os.cpu_count()) as executor:
+        futures = {executor.submit(get_file_hash, file_path, hash_algo): file_path for file_path in file_list}
+
+        # Collect the results with a progress bar
+        for future in tqdm(as_completed(futures), total=len(futures), desc=f"Processing {folder_path}", unit="file"):
+            file_hashes[futures[future]] = future.result()
     
     return file_hashes
 
@@ -45,18 +85,25 @@ def move_duplicate(file_path, dump_folder, folder2_path):
     shutil.move(file_path, target_path)
     print(f"Moved duplicate: {file_path} to {target_path}")
 
-def find_and_move_duplicates(folder1, folder2, dump_folder, hash_algo='sha256'):
+def find_and_move_duplicates(folder1, folder2, dump_folder, hash_algo=DEFAULT_HASH_ALGO):
     """Find and move duplicate files from folder2 to the dump folder, maintaining subfolder structure."""
-    folder1_hashes = get_folder_hashes(folder1, hash_algo)
-    folder2_hashes = get_folder_hashes(folder2, hash_algo)
+    folder1_sizes = get_folder_sizes(folder1)
+    folder2_sizes = get_folder_sizes(folder2)
+
+    # Only files with a matching size in both folders need to be hashed
+    common_sizes = set(folder1_sizes.values()) & set(folder2_sizes.values())
+
+    folder1_hashes = get_folder_hashes(folder1, folder1_sizes, common_sizes, hash_algo)
+    folder2_hashes = get_folder_hashes(folder2, folder2_sizes, common_sizes, hash_algo)
 
+    folder1_hash_set = set(folder1_hashes.values())
     duplicates = 0
 
     print("\nComparing files for duplicates...\n")
     
     # Check for duplicates in folder2 compared to folder1 with progress
     for file2_path, file2_hash in tqdm(folder2_hashes.items(), desc="Comparing hashes", unit="file"):
-        if file2_hash in folder1_hashes.values():
+        if file2_hash in folder1_hash_set:
             move_duplicate(file2_path, dump_folder, folder2)
             duplicates += 1
 
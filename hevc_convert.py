@@ -2,6 +2,12 @@ import subprocess
 import os
 from tqdm import tqdm
 
+# Constant-quality VBR with the p1-p7 preset scale and lookahead
+NVENC_ARGS = ["-preset", "p5", "-tune", "hq", "-rc", "vbr", "-cq", "23", "-b:v", "0",
+              "-maxrate", "10M", "-bufsize", "20M", "-spatial_aq", "1", "-rc-lookahead", "20"]
+QSV_ARGS = ["-preset", "veryslow", "-global_quality", "23"]
+X265_ARGS = ["-preset", "medium", "-b:v", "2M"]
+
 def check_nvidia_gpu():
     """Check if NVIDIA GPU is available."""
     try:
@@ -23,37 +29,35 @@ def check_intel_qsv():
     except subprocess.CalledProcessError:
         return False
 
-def convert_to_hevc(input_file):
-    """Convert video stream to HEVC with fallback for hardware encoding."""
-    output_file = f"{os.path.splitext(input_file)[0]}_hevc.mkv"
-
+def detect_encoder():
+    """Pick the best available HEVC encoder and its quality settings."""
     if check_nvidia_gpu():
-        print(f"NVIDIA GPU found. Using NVENC for {os.path.basename(input_file)}.")
-        video_encoder = "hevc_nvenc"
-        preset = "p7"
+        print("NVIDIA GPU found. Using NVENC.")
+        return "hevc_nvenc", NVENC_ARGS
     elif check_intel_qsv():
-        print(f"Intel QSV found. Using QSV for {os.path.basename(input_file)}.")
-        video_encoder = "hevc_qsv"
-        preset = None  # QSV doesn't need a preset
+        print("Intel QSV found. Using QSV.")
+        return "hevc_qsv", QSV_ARGS
     else:
-        print(f"No hardware encoder found. Falling back to software encoding (libx265) for {os.path.basename(input_file)}.")
-        video_encoder = "libx265"
-        preset = "medium"
+        print("No hardware encoder found. Falling back to software encoding (libx265).")
+        return "libx265", X265_ARGS
 
-    command = ["ffmpeg", "-i", input_file, "-c:v", video_encoder]
+def convert_to_hevc(input_file, video_encoder, encoder_args):
+    """Convert video stream to HEVC with the detected encoder."""
+    output_file = f"{os.path.splitext(input_file)[0]}_hevc.mkv"
 
-    if preset:
-        command.extend(["-preset", preset])
-        
-    command.extend(["-b:v", "2M", "-c:a", "copy", "-c:s", "copy", "-map_chapters", "0", output_file])
+    # Machine-readable key=value progress on stdout instead of the stats line
+    command = ["ffmpeg", "-progress", "pipe:1", "-nostats", "-i", input_file, "-c:v", video_encoder]
+
+    command.extend(encoder_args)
+    command.extend(["-c:a", "copy", "-c:s", "copy", "-map_chapters", "0", output_file])
 
     # Run the command with a progress bar
     try:
         with tqdm(total=100, desc=os.path.basename(input_file), unit="%", ncols=100) as pbar:
             process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, universal_newlines=True)
             for line in process.stdout:
-                if "frame=" in line:
-                    progress = parse_progress(line)
+                progress = parse_progress(line)
+                if progress is not None:
                     pbar.update(progress - pbar.n)
             process.wait()
             if process.returncode != 0:
@@ -67,28 +71,25 @@ def convert_to_hevc(input_file):
         print(f"Error during conversion of {os.path.basename(input_file)}: {e}")
 
 def parse_progress(ffmpeg_output_line):
-    """Parse progress percentage from ffmpeg output."""
-    if "time=" in ffmpeg_output_line:
-        time_str = ffmpeg_output_line.split("time=")[1].split(" ")[0]
-        time_parts = list(map(float, time_str.split(":")))
-        seconds = time_parts[0] * 3600 + time_parts[1] * 60 + time_parts[2]
-        return int((seconds / total_duration) * 100)
-    return 0
+    """Parse progress percentage from ffmpeg -progress output."""
+    if ffmpeg_output_line.startswith("out_time_us="):
+        out_time_us = ffmpeg_output_line[len("out_time_us="):].strip()
+        if out_time_us.isdigit() and total_duration:
+            return min(int(int(out_time_us) / 1_000_000 / total_duration * 100), 100)
+    return None
 
 def get_total_duration(input_file):
     """Get the total duration of the video in seconds."""
     result = subprocess.run(
-        ["ffmpeg", "-i", input_file],
+        ["ffprobe", "-v", "error", "-show_entries", "format=duration", "-of", "default=noprint_wrappers=1:nokey=1", input_file],
         stdout=subprocess.PIPE,
-        stderr=subprocess.STDOUT,
+        stderr=subprocess.DEVNULL,
         universal_newlines=True
     )
-    for line in result.stdout.splitlines():
-        if "Duration" in line:
-            time_str = line.split("Duration: ")[1].split(",")[0]
-            time_parts = list(map(float, time_str.split(":")))
-            return time_parts[0] * 3600 + time_parts[1] * 60 + time_parts[2]
-    return 0
+    try:
+        return float(result.stdout.strip())
+    except ValueError:
+        return 0
 
 def process_folder(folder_path):
     """Process all MKV files in the given folder."""
@@ -98,10 +99,13 @@ def process_folder(folder_path):
         print("No MKV files found in the folder.")
         return
 
+    # Probe the hardware once rather than for every file
+    video_encoder, encoder_args = detect_encoder()
+
     for input_file in mkv_files:
         global total_duration
         total_duration = get_total_duration(input_file)
-        convert_to_hevc(input_file)
+        convert_to_hevc(input_file, video_encoder, encoder_args)
 
 if __name__ == "__main__":
     folder_path = input("Enter the path to the folder containing MKV files: ")
@@ -1,7 +1,14 @@
+import asyncio
 import subprocess
 import os
 from tqdm import tqdm
 
+# Constant-quality VBR with the p1-p7 preset scale and lookahead
+NVENC_ARGS = ["-preset", "p5", "-tune", "hq", "-rc", "vbr", "-cq", "23", "-b:v", "0",
+              "-maxrate", "10M", "-bufsize", "20M", "-spatial_aq", "1", "-rc-lookahead", "20"]
+QSV_ARGS = ["-preset", "veryslow", "-global_quality", "23"]
+X265_ARGS = ["-preset", "medium", "-b:v", "2M"]
+
 def check_nvidia_gpu():
     """Check if NVIDIA GPU is available."""
     try:
@@ -23,74 +30,97 @@ def check_intel_qsv():
     except subprocess.CalledProcessError:
         return False
 
-def convert_to_hevc(input_file, output_file):
-    """Convert video stream to HEVC with fallback for hardware encoding."""
+def detect_encoder():
+    """Pick the best available HEVC encoder and its quality settings."""
     if check_nvidia_gpu():
-        print(f"NVIDIA GPU found. Using NVENC for {os.path.basename(input_file)}.")
-        video_encoder = "hevc_nvenc"
-        preset = "q7"
+        print("NVIDIA GPU found. Using NVENC.")
+        return "hevc_nvenc", NVENC_ARGS
     elif check_intel_qsv():
-        print(f"Intel QSV found. Using QSV for {os.path.basename(input_file)}.")
-        video_encoder = "hevc_qsv"
-        preset = None  # QSV doesn't need a preset
+        print("Intel QSV found. Using QSV.")
+        return "hevc_qsv", QSV_ARGS
     else:
-        print(f"No hardware encoder found. Falling back to software encoding (libx265) for {os.path.basename(input_file)}.")
-        video_encoder = "libx265"
-        preset = "medium"
+        print("No hardware encoder found. Falling back to software encoding (libx265).")
+        return "libx265", X265_ARGS
 
-    command = ["ffmpeg", "-i", input_file, "-c:v", video_encoder]
+def get_max_concurrent(video_encoder):
+    """Get how many files to encode at once, overridable with HEVC_MAX_CONCURRENT."""
+    max_concurrent = os.getenv("HEVC_MAX_CONCURRENT")
+    if max_concurrent:
+        try:
+            return max(1, int(max_concurrent))
+        except ValueError:
+            print(f"Invalid HEVC_MAX_CONCURRENT value: {max_concurrent}. Using the encoder default.")
+    if video_encoder == "hevc_nvenc":
+        return 2  # Consumer NVENC handles a few sessions at once
+    if video_encoder == "hevc_qsv":
+        return 1
+    return max(1, (os.cpu_count() or 1) // 4)  # libx265 already uses several threads per encode
 
-    if preset:
-        command.extend(["-preset", preset])
-        
-    command.extend(["-b:v", "2M", "-c:a", "copy", "-c:s", "copy", "-map_chapters", "0", output_file])
+async def convert_to_hevc(input_file, output_file, video_encoder, encoder_args, semaphore):
+    """Convert video stream to HEVC with the detected encoder."""
+    async with semaphore:
+        total_duration = await asyncio.to_thread(get_total_duration, input_file)
 
-    # Run the command with a progress bar
-    try:
-        process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, universal_newlines=True)
-        with tqdm(desc=os.path.basename(input_file), unit="%", ncols=100) as pbar:
-            for line in process.stdout:
-                if "frame=" in line:
-                    progress = parse_progress(line)
+        # Machine-readable key=value progress on stdout instead of the stats line, and keep
+        # the concurrent ffmpeg processes from fighting over the terminal's stdin
+        command = ["ffmpeg", "-nostdin", "-progress", "pipe:1", "-nostats", "-i", input_file, "-c:v", video_encoder]
+
+        command.extend(encoder_args)
+        command.extend(["-c:a", "copy", "-c:s", "copy", "-map_chapters", "0", output_file])
+
+        # Run the command with a progress bar
+        process = None
+        try:
+            process = await asyncio.create_subprocess_exec(*command, stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
+            with tqdm(desc=os.path.basename(input_file), unit="%", ncols=100) as pbar:
+                async for line in process.stdout:
+                    progress = parse_progress(line.decode(errors="replace"), total_duration)
                     if progress is not None:
                         pbar.update(progress - pbar.n)
-            process.wait()
-            if process.returncode != 0:
-                raise subprocess.CalledProcessError(process.returncode, command)
-    except KeyboardInterrupt:
-        print(f"\nConversion interrupted. Deleting incomplete file: {output_file}")
-        if os.path.exists(output_file):
-            os.remove(output_file)
-        raise  # Re-raise the exception to exit the script
-    except subprocess.CalledProcessError as e:
-        print(f"Error during conversion of {os.path.basename(input_file)}: {e}")
-
-def parse_progress(ffmpeg_output_line):
-    """Parse progress percentage from ffmpeg output."""
-    if "time=" in ffmpeg_output_line:
-        time_str = ffmpeg_output_line.split("time=")[1].split(" ")[0]
-        time_parts = list(map(float, time_str.split(":")))
-        seconds = time_parts[0] * 3600 + time_parts[1] * 60 + time_parts[2]
-        return int((seconds / total_duration) * 100)
+                await process.wait()
+                if process.returncode != 0:
+                    raise subprocess.CalledProcessError(process.returncode, command)
+        except asyncio.CancelledError:
+            print(f"\nConversion interrupted. Deleting incomplete file: {output_file}")
+            if process and process.returncode is None:
+                process.kill()
+            # Delete before awaiting anything, a second cancellation can interrupt the wait below
+            if os.path.exists(output_file):
+                os.remove(output_file)
+            if process:
+                await process.wait()
+            raise  # Re-raise the exception to exit the script
+        except subprocess.CalledProcessError as e:
+            print(f"Error during conversion of {os.path.basename(input_file)}: {e}")
+
+def parse_progress(ffmpeg_output_line, total_duration):
+    """Parse progress percentage from ffmpeg -progress output."""
+    if ffmpeg_output_line.startswith("out_time_us="):
+        out_time_us = ffmpeg_output_line[len("out_time_us="):].strip()
+        if out_time_us.isdigit() and total_duration:
+            return min(int(int(out_time_us) / 1_000_000 / total_duration * 100), 100)
     return None
 
 def get_total_duration(input_file):
     """Get the total duration of the video in seconds."""
     result = subprocess.run(
-        ["ffmpeg", "-i", input_file],
+        ["ffprobe", "-v", "error", "-show_entries", "format=duration", "-of", "default=noprint_wrappers=1:nokey=1", input_file],
         stdout=subprocess.PIPE,
-        stderr=subprocess.STDOUT,
+        stderr=subprocess.DEVNULL,
         universal_newlines=True
     )
-    for line in result.stdout.splitlines():
-        if "Duration" in line:
-            time_str = line.split("Duration: ")[1].split(",")[0]
-            time_parts = list(map(float, time_str.split(":")))
-            return time_parts[0] * 3600 + time_parts[1] * 60 + time_parts[2]
-    return 0
-
-def process_folder(source_folder, output_folder):
+    try:
+        return float(result.stdout.strip())
+    except ValueError:
+        return 0
+
+async def process_folder(source_folder, output_folder):
     """Process all MKV files in the given folder, preserving folder structure."""
+    # Probe the hardware once rather than for every file
+    video_encoder, encoder_args = detect_encoder()
+    semaphore = asyncio.Semaphore(get_max_concurrent(video_encoder))
+
+    conversions = []
     for root, dirs, files in os.walk(source_folder):
         for file in files:
             if file.endswith(".mkv"):
@@ -99,9 +129,17 @@ def process_folder(source_folder, output_folder):
                 output_dir = os.path.join(output_folder, relative_path)
                 os.makedirs(output_dir, exist_ok=True)
                 output_file = os.path.join(output_dir, f"{os.path.splitext(file)[0]}_hevc.mkv")
-                global total_duration
-                total_duration = get_total_duration(input_file)
-                convert_to_hevc(input_file, output_file)
+                conversions.append(convert_to_hevc(input_file, output_file, video_encoder, encoder_args, semaphore))
+
+    tasks = [asyncio.create_task(conversion) for conversion in conversions]
+    try:
+        await asyncio.gather(*tasks)
+    except asyncio.CancelledError:
+        # Let every conversion clean up its partial output before the event loop shuts down
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        raise
 
 if __name__ == "__main__":
     source_folder = input("Enter the path to the source folder containing MKV files: ")
@@ -113,6 +151,6 @@ if __name__ == "__main__":
         print(f"Output folder not found: {output_folder}")
     else:
         try:
-            process_folder(source_folder, output_folder)
+            asyncio.run(process_folder(source_folder, output_folder))
         except KeyboardInterrupt:
             print("Bulk conversion interrupted.")
@@ -1,31 +1,49 @@
 import os
+from multiprocessing import Pool
 from PIL import Image
 import piexif
 
 def remove_gps_exif(image_path, output_path):
-    img = Image.open(image_path)
-    exif_data = img.info.get('exif')
-    
-    if exif_data:
-        # Load the EXIF data and remove GPS info if it exists
-        exif_dict = piexif.load(exif_data)
-        exif_dict.pop('GPS', None)  # Remove GPS data
+    with Image.open(image_path) as img:
+        exif_data = img.info.get('exif')
         
-        # Dump new EXIF data without GPS
-        new_exif_data = piexif.dump(exif_dict)
-        
-        # Save the image without GPS metadata
-        img.save(output_path, exif=new_exif_data)
-        print(f"Processed {image_path}, GPS data removed.")
-    else:
-        print(f"No EXIF data found in {image_path}. Skipping...")
+        if exif_data:
+            # Load the EXIF data and remove GPS info if it exists
+            exif_dict = piexif.load(exif_data)
+            exif_dict.pop('GPS', None)  # Remove GPS data
+            
+            # Dump new EXIF data without GPS
+            new_exif_data = piexif.dump(exif_dict)
+            
+            if img.format == 'JPEG':
+                # Swap the EXIF segment in place without re-encoding the pixels
+                piexif.insert(new_exif_data, image_path, output_path)
+            else:
+                # Save the image without GPS metadata
+                img.save(output_path, exif=new_exif_data)
+            print(f"Processed {image_path}, GPS data removed.")
+        else:
+            print(f"No EXIF data found in {image_path}. Skipping...")
+
+def process_image(image_path):
+    folder, filename = os.path.split(image_path)
+    output_path = os.path.join(folder, f"no_gps_{filename}")
+    remove_gps_exif(image_path, output_path)
+
+def find_images(folder):
+    with os.scandir(folder) as entries:
+        for entry in entries:
+            # Outputs land in the same folder while scanning, so skip them
+            if entry.name.startswith("no_gps_"):
+                continue
+            if entry.is_file() and entry.name.lower().endswith(('.jpg', '.jpeg', '.png')):
+                yield entry.path
 
 def process_images(folder):
-    for filename in os.listdir(folder):
-        if filename.lower().endswith(('.jpg', '.jpeg', '.png')):
-            image_path = os.path.join(folder, filename)
-            output_path = os.path.join(folder, f"no_gps_{filename}")
-            remove_gps_exif(image_path, output_path)
+    # Strip the images in parallel across all cores
+    with Pool(os.cpu_count()) as pool:
+        for _ in pool.imap_unordered(process_image, find_images(folder)):
+            pass
 
 if __name__ == "__main__":
     folder = "/home/techkid/Photos-001"  # Replace with your images folder
@@ -1,28 +1,54 @@
 from pathlib import Path
+import atexit
 import os
+import platform
+import queue
+import re
 import subprocess
 import time
 from datetime import datetime
 import requests
+from requests.adapters import HTTPAdapter
 import logging
+from logging.handlers import QueueHandler, QueueListener
 from dotenv import load_dotenv
 
 # Set up constants
 SCRIPT_DIR = Path(__file__).parent
 ERRORLOG = SCRIPT_DIR / "smart_test_error.log"
-BASH_SCRIPT = SCRIPT_DIR / "smart_data_collection.sh"
 SMART_RESULTS = Path("/tmp/smart_results.txt")
 DRIVE = "/dev/sda"
+HOSTNAME = platform.node()
+IMPORTANT_SECTIONS = [
+    "SMART overall-health self-assessment test result",
+    "SMART Attributes Data Structure revision number",
+    "Vendor Specific SMART Attributes with Thresholds",
+    "SMART Error Log Version",
+    "SMART Self-test log structure revision number",
+    "SMART Selective self-test log data structure revision number"
+]
+IMPORTANT_SECTIONS_RE = re.compile("|".join(re.escape(section) for section in IMPORTANT_SECTIONS))
+POLLING_TIME_RE = re.compile(r"Short self-test routine\s+recommended polling time:\s+\(\s*(\d+)\) minutes")
+REMAINING_PERCENT_RE = re.compile(r"(\d+)% of test remaining")
 
 def setup_logging():
     try:
-        logging.basicConfig(filename=ERRORLOG, level=logging.DEBUG,
-                            format='%(asctime)s - %(levelname)s - %(message)s',
-                            filemode='w')  # Overwrite the log file
-        logging.info("Logging initialized")
+        file_handler = logging.FileHandler(ERRORLOG, mode='w')  # Overwrite the log file
     except PermissionError:
         print(f"Permission denied when trying to write to {ERRORLOG}.")
         exit(1)
+    file_handler.setFormatter(logging.Formatter('%(asctime)s - %(levelname)s - %(message)s'))
+
+    # Write records from a background thread so logging calls never wait on disk I/O
+    log_queue = queue.Queue(-1)
+    listener = QueueListener(log_queue, file_handler)
+    listener.start()
+    atexit.register(listener.stop)
+
+    root_logger = logging.getLogger()
+    root_logger.setLevel(logging.DEBUG)
+    root_logger.addHandler(QueueHandler(log_queue))
+    logging.info("Logging initialized")
 
 # Call the setup_logging function
 setup_logging()
@@ -31,22 +57,27 @@ setup_logging()
 load_dotenv(SCRIPT_DIR / 'config.env')
 WEBHOOK_URL = os.getenv('DISCORD_WEBHOOK_URL')
 
+# Reuse one connection to Discord instead of a new TLS handshake per message
+SESSION = requests.Session()
+SESSION.mount("https://", HTTPAdapter(pool_connections=1, pool_maxsize=4))
+
 def send_discord_message(message, file_path=None):
     if not WEBHOOK_URL:
         logging.error("Discord webhook URL is not set")
         return False
 
     try:
-        files = {"file": open(file_path, "rb")} if file_path and Path(file_path).exists() else None
-        response = requests.post(WEBHOOK_URL, data={"content": message}, files=files)
+        if file_path and Path(file_path).exists():
+            with open(file_path, "rb") as file:
+                files = {"file": (Path(file_path).name, file, "text/plain")}
+                response = SESSION.post(WEBHOOK_URL, data={"content": message}, files=files)
+        else:
+            response = SESSION.post(WEBHOOK_URL, data={"content": message})
         response.raise_for_status()
         return True
     except requests.RequestException as e:
         logging.error(f"Failed to send Discord message: {str(e)}")
         return False
-    finally:
-        if files:
-            files["file"].close()
 
 def run_command(command):
     try:
@@ -60,47 +91,62 @@ def run_command(command):
 def start_smart_test():
     return run_command(["smartctl", "-t", "short", DRIVE])
 
-def check_smart_test_status():
-    status = run_command(["smartctl", "-c", DRIVE])
+def get_smart_test_status():
+    return run_command(["smartctl", "-c", DRIVE])
+
+def check_smart_test_status(status):
     return "Self-test execution status:      (   0)" in status if status else False
 
+def get_polling_time(status):
+    match = POLLING_TIME_RE.search(status or "")
+    return int(match.group(1)) * 60 if match else None
+
+def get_remaining_percent(status):
+    match = REMAINING_PERCENT_RE.search(status or "")
+    return int(match.group(1)) if match else None
+
 def wait_for_smart_test(timeout=600):
     start_time = time.time()
+    polling_time = None
+    delay = 0.5
     while time.time() - start_time < timeout:
-        if check_smart_test_status():
+        status = get_smart_test_status()
+        if check_smart_test_status(status):
             logging.info("SMART test completed successfully")
             return True
-        time.sleep(30)
+
+        polling_time = polling_time or get_polling_time(status)
+        remaining_percent = get_remaining_percent(status)
+        if polling_time and remaining_percent is not None:
+            # Sleep for about as long as the drive says the test still needs
+            sleep_time = max(5, min(remaining_percent * polling_time / 100, 120))
+        else:
+            # No estimate available, so back off from short polls
+            sleep_time = delay
+            delay = min(delay * 1.5, 30)
+        remaining = timeout - (time.time() - start_time)
+        time.sleep(max(0, min(sleep_time, remaining)))
     logging.error(f"SMART test did not complete within {timeout} seconds")
     return False
 
-def run_bash_script():
-    try:
-        subprocess.run(["sudo", "bash", str(BASH_SCRIPT)], check=True)
-        logging.info("Bash script executed successfully")
-        return True
-    except subprocess.CalledProcessError as e:
-        logging.error(f"Bash script failed: {e}")
-        return False
-
-def read_smart_results():
+def collect_smart_data():
+    parsed_lines = []
     try:
-        with open(SMART_RESULTS, 'r') as file:
-            return file.read()
-    except IOError as e:
-        logging.error(f"Error reading SMART results: {e}")
+        with open(SMART_RESULTS, 'w') as file, \
+                subprocess.Popen(["smartctl", "-a", DRIVE], stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True) as process:
+            # Save the full report and pick out the important lines in the same pass
+            for line in process.stdout:
+                file.write(line)
+                if IMPORTANT_SECTIONS_RE.search(line):
+                    parsed_lines.append(line.rstrip("\n"))
+    except OSError as e:
+        logging.error(f"Failed to collect SMART data: {e}")
         return None
-
-def parse_smart_results(results):
-    important_sections = [
-        "SMART overall-health self-assessment test result",
-        "SMART Attributes Data Structure revision number",
-        "Vendor Specific SMART Attributes with Thresholds",
-        "SMART Error Log Version",
-        "SMART Self-test log structure revision number",
-        "SMART Selective self-test log data structure revision number"
-    ]
-    return "\n".join([line for line in results.splitlines() if any(section in line for section in important_sections)])
+    # smartctl's exit status is a bitmask; only bits 0-1 mean the command itself failed
+    if process.returncode & 0b11:
+        logging.error(f"smartctl -a failed (code: {process.returncode})")
+        return None
+    return "\n".join(parsed_lines)
 
 def main():
     logging.info("Script started")
@@ -117,20 +163,15 @@ def main():
         send_discord_message(f"Error: SMART test did not complete on {DRIVE}")
         return
 
-    if not run_bash_script():
-        send_discord_message("Error: Failed to run SMART data collection script.")
-        return
-
-    results = read_smart_results()
-    if not results:
-        send_discord_message("Error: Failed to read SMART test results.")
+    parsed_results = collect_smart_data()
+    if parsed_results is None:
+        send_discord_message(f"Error: Failed to collect SMART data from {DRIVE}.")
         return
 
-    parsed_results = parse_smart_results(results)
     logging.info("Parsed SMART test results")
     logging.info(parsed_results)
 
-    send_discord_message(f"SMART log of {DRIVE} on {os.uname().nodename} at {datetime.now()}:", file_path=SMART_RESULTS)
+    send_discord_message(f"SMART log of {DRIVE} on {HOSTNAME} at {datetime.now()}:", file_path=SMART_RESULTS)
 
     logging.info("Script completed")
 
@@ -1,29 +1,53 @@
 import json
 import csv
 import datetime
+from operator import itemgetter
 from pathlib import Path
 
-def format_date(date_str):
-    """Convert ISO date string to a more readable format."""
+DATE_FORMAT = "%Y-%m-%dT%H:%M:%S.%fZ"
+OUTPUT_BUFFER_SIZE = 1024 * 1024  # Fewer write syscalls for large exports
+
+def parse_date(date_str):
+    """Parse an ISO date string from the subscriptions file."""
+    return datetime.datetime.strptime(date_str, DATE_FORMAT)
+
+def format_date(date):
+    """Convert an ISO date string or datetime to a more readable format."""
     try:
-        date = datetime.datetime.strptime(date_str, "%Y-%m-%dT%H:%M:%S.%fZ")
+        if isinstance(date, str):
+            date = parse_date(date)
         return date.strftime("%B %d, %Y")
     except:
-        return date_str
+        return date
 
-def create_csv(input_file='my_subscriptions.json', output_file='subscriptions.csv'):
-    """Convert JSON data to CSV format."""
+def load_subscriptions(input_file='my_subscriptions.json'):
+    """Read the JSON file and sort it by subscription date."""
     try:
-        # Read JSON file
         with open(input_file, 'r', encoding='utf-8') as f:
             data = json.load(f)
         
         if not data:
             print("No data found in JSON file.")
-            return
+            return None
         
         # Sort data by subscription date
-        data.sort(key=lambda x: x['subscribed_at'])
+        data.sort(key=itemgetter('subscribed_at'))
+        return data
+        
+    except FileNotFoundError:
+        print(f"Error: Could not find input file '{input_file}'")
+    except Exception as e:
+        print(f"Error reading input file: {str(e)}")
+    return None
+
+def create_csv(input_file='my_subscriptions.json', output_file='subscriptions.csv', data=None):
+    """Convert JSON data to CSV format."""
+    try:
+        # Read JSON file unless the caller already loaded it
+        if data is None:
+            data = load_subscriptions(input_file)
+        if not data:
+            return
         
         # Prepare CSV fields
         fieldnames = [
@@ -38,18 +62,19 @@ def create_csv(input_file='my_subscriptions.json', output_file='subscriptions.cs
         current_date = datetime.datetime.now()
         
         # Write to CSV
-        with open(output_file, 'w', newline='', encoding='utf-8') as f:
+        with open(output_file, 'w', newline='', encoding='utf-8', buffering=OUTPUT_BUFFER_SIZE) as f:
             writer = csv.DictWriter(f, fieldnames=fieldnames)
             writer.writeheader()
             
             for item in data:
-                sub_date = datetime.datetime.strptime(item['subscribed_at'], "%Y-%m-%dT%H:%M:%S.%fZ")
+                # Parse the date once and reuse it for both columns
+                sub_date = parse_date(item['subscribed_at'])
                 days_subscribed = (current_date - sub_date).days
                 
                 writer.writerow({
                     'Channel Name': item['channel_name'],
                     'Channel ID': item['channel_id'],
-                    'Subscription Date': format_date(item['subscribed_at']),
+                    'Subscription Date': format_date(sub_date),
                     'Days Subscribed': days_subscribed,
                     'URL': f"https://youtube.com/channel/{item['channel_id']}"
                 })
@@ -57,56 +82,57 @@ def create_csv(input_file='my_subscriptions.json', output_file='subscriptions.cs
         print(f"CSV file created successfully: {output_file}")
         print(f"Total subscriptions: {len(data)}")
         
-    except FileNotFoundError:
-        print(f"Error: Could not find input file '{input_file}'")
     except Exception as e:
         print(f"Error creating CSV: {str(e)}")
 
-def create_pretty_json(input_file='my_subscriptions.json', output_file='subscriptions_pretty.json'):
+def create_pretty_json(input_file='my_subscriptions.json', output_file='subscriptions_pretty.json', data=None):
     """Create a more readable JSON file with additional information."""
     try:
-        # Read JSON file
-        with open(input_file, 'r', encoding='utf-8') as f:
-            data = json.load(f)
-        
+        # Read JSON file unless the caller already loaded it
+        if data is None:
+            data = load_subscriptions(input_file)
         if not data:
-            print("No data found in JSON file.")
             return
         
-        # Sort data by subscription date
-        data.sort(key=lambda x: x['subscribed_at'])
+        # Calculate days subscribed
+        current_date = datetime.datetime.now()
         
-        # Create enhanced data structure
-        enhanced_data = {
-            "metadata": {
-                "total_subscriptions": len(data),
-                "export_date": datetime.datetime.now().strftime("%B %d, %Y %H:%M:%S"),
-                "oldest_subscription": format_date(data[0]['subscribed_at']),
-                "newest_subscription": format_date(data[-1]['subscribed_at'])
-            },
-            "subscriptions": [
-                {
-                    "channel_name": item['channel_name'],
-                    "channel_id": item['channel_id'],
-                    "subscription_date": format_date(item['subscribed_at']),
-                    "channel_url": f"https://youtube.com/channel/{item['channel_id']}",
-                    "days_subscribed": (datetime.datetime.now() - 
-                                      datetime.datetime.strptime(item['subscribed_at'], 
-                                                              "%Y-%m-%dT%H:%M:%S.%fZ")).days
-                }
-                for item in data
-            ]
+        metadata = {
+            "total_subscriptions": len(data),
+            "export_date": current_date.strftime("%B %d, %Y %H:%M:%S"),
+            "oldest_subscription": format_date(data[0]['subscribed_at']),
+            "newest_subscription": format_date(data[-1]['subscribed_at'])
         }
         
-        # Write pretty JSON
-        with open(output_file, 'w', encoding='utf-8') as f:
-            json.dump(enhanced_data, f, indent=4, ensure_ascii=False)
+        # Write pretty JSON one subscription at a time instead of building the whole document.
+        # Stream into a temp file so a bad row can't leave a truncated export behind.
+        output_path = Path(output_file)
+        temp_path = output_path.with_name(output_path.name + '.tmp')
+        try:
+            with open(temp_path, 'w', encoding='utf-8', buffering=OUTPUT_BUFFER_SIZE) as f:
+                metadata_json = json.dumps(metadata, indent=4, ensure_ascii=False).replace('\n', '\n    ')
+                f.write(f'{{\n    "metadata": {metadata_json},\n    "subscriptions": [')
+                for index, item in enumerate(data):
+                    # Parse the date once and reuse it for both fields
+                    sub_date = parse_date(item['subscribed_at'])
+                    row = {
+                        "channel_name": item['channel_name'],
+                        "channel_id": item['channel_id'],
+                        "subscription_date": format_date(sub_date),
+                        "channel_url": f"https://youtube.com/channel/{item['channel_id']}",
+                        "days_subscribed": (current_date - sub_date).days
+                    }
+                    row_json = json.dumps(row, indent=4, ensure_ascii=False).replace('\n', '\n        ')
+                    f.write(f'{"," if index else ""}\n        {row_json}')
+                f.write('\n    ]\n}')
+            temp_path.replace(output_path)
+        except BaseException:
+            temp_path.unlink(missing_ok=True)
+            raise
         
         print(f"Pretty JSON file created successfully: {output_file}")
         print(f"Total subscriptions: {len(data)}")
         
-    except FileNotFoundError:
-        print(f"Error: Could not find input file '{input_file}'")
     except Exception as e:
         print(f"Error creating pretty JSON: {str(e)}")
 
@@ -128,8 +154,11 @@ def main():
         elif choice == '2':
             create_pretty_json()
         elif choice == '3':
-            create_csv()
-            create_pretty_json()
+            # Load the subscriptions once and share them between both outputs
+            data = load_subscriptions()
+            if data:
+                create_csv(data=data)
+                create_pretty_json(data=data)
         elif choice == '4':
             break
         else:
@@ -1,11 +1,20 @@
 from googleapiclient.discovery import build
+from google.auth.exceptions import RefreshError
+from google.auth.transport.requests import Request
 from google.oauth2.credentials import Credentials
 from google_auth_oauthlib.flow import InstalledAppFlow
-import datetime
+import atexit
 import json
 import os
 import logging
-from logging.handlers import RotatingFileHandler
+import queue
+from operator import itemgetter
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
 
 # Disable OAuthlib's HTTPS verification when running locally.
 os.environ["OAUTHLIB_INSECURE_TRANSPORT"] = "1"
@@ -21,8 +30,8 @@ def setup_logging():
     # Create logs directory if it doesn't exist
     os.makedirs('logs', exist_ok=True)
     
-    # Configure logging format
-    log_format = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+    # Configure logging format, shared by both handlers
+    formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
     
     # Create logger
     logger = logging.getLogger('YouTubeSubscriptions')
@@ -31,7 +40,7 @@ def setup_logging():
     # Create console handler
     console_handler = logging.StreamHandler()
     console_handler.setLevel(logging.INFO)
-    console_handler.setFormatter(logging.Formatter(log_format))
+    console_handler.setFormatter(formatter)
     
     # Create file handler
     file_handler = RotatingFileHandler(
@@ -40,11 +49,17 @@ def setup_logging():
         backupCount=5
     )
     file_handler.setLevel(logging.DEBUG)
-    file_handler.setFormatter(logging.Formatter(log_format))
+    file_handler.setFormatter(formatter)
+    
+    # Write to the log file from a background thread so logging never waits on disk I/O
+    log_queue = queue.Queue(-1)
+    listener = QueueListener(log_queue, file_handler, respect_handler_level=True)
+    listener.start()
+    atexit.register(listener.stop)
     
     # Add handlers to logger
     logger.addHandler(console_handler)
-    logger.addHandler(file_handler)
+    logger.addHandler(QueueHandler(log_queue))
     
     return logger
 
@@ -55,7 +70,7 @@ class QuotaTracker:
         
     def add_subscription_request(self):
         self.subscription_requests += 1
-        self.logger.debug(f"API request made. Total requests: {self.subscription_requests}")
+        self.logger.debug("API request made. Total requests: %d", self.subscription_requests)
         
     def get_total_units(self):
         return self.subscription_requests
@@ -71,23 +86,52 @@ class QuotaTracker:
         self.logger.info(summary)
         print(summary)
 
+def save_token(creds):
+    """Save credentials to token.json, readable only by the current user."""
+    fd = os.open('token.json', os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    # The mode above only applies to new files, so also lock down an existing token.json
+    os.fchmod(fd, 0o600)
+    with os.fdopen(fd, 'w') as token:
+        token.write(creds.to_json())
+
+def save_subscriptions(subs, filename='my_subscriptions.json'):
+    """Save subscriptions as indented JSON, using orjson when available."""
+    if orjson:
+        with open(filename, 'wb') as f:
+            f.write(orjson.dumps(subs, option=orjson.OPT_INDENT_2))
+    else:
+        with open(filename, 'w', encoding='utf-8') as f:
+            json.dump(subs, f, ensure_ascii=False, indent=2)
+
 def get_authenticated_service(logger):
     """Get authenticated YouTube service."""
     try:
         logger.info("Starting authentication process")
+        creds = None
         if os.path.exists('token.json'):
             logger.debug("Found existing token.json")
             creds = Credentials.from_authorized_user_file('token.json', SCOPES)
-        else:
-            logger.info("No token.json found. Starting OAuth flow")
+        
+        if creds and creds.expired and creds.refresh_token:
+            # Refresh the saved token instead of going through the browser flow again
+            logger.info("Access token expired. Refreshing")
+            try:
+                creds.refresh(Request())
+                save_token(creds)
+                logger.info("Token refreshed and saved")
+            except RefreshError as e:
+                logger.warning(f"Token refresh failed: {str(e)}")
+                creds = None
+        
+        if not creds or not creds.valid:
+            logger.info("No valid token found. Starting OAuth flow")
             flow = InstalledAppFlow.from_client_secrets_file(
                 'client_secrets.json', 
                 SCOPES,
                 redirect_uri='http://localhost:8080'
             )
             creds = flow.run_local_server(port=8080)
-            with open('token.json', 'w') as token:
-                token.write(creds.to_json())
+            save_token(creds)
             logger.info("Authentication successful. Token saved")
         
         return build('youtube', 'v3', credentials=creds)
@@ -141,24 +185,31 @@ def get_subscriptions(youtube, channel_id, quota_tracker, logger):
                 part='snippet',
                 channelId=channel_id,
                 maxResults=50,
-                pageToken=next_page_token
+                pageToken=next_page_token,
+                # Only download the fields that are actually used below
+                fields='nextPageToken,items(snippet(title,resourceId/channelId,publishedAt))'
             )
             
             quota_tracker.add_subscription_request()
             response = request.execute()
             
-            batch_size = len(response['items'])
-            logger.debug(f"Fetched batch of {batch_size} subscriptions")
+            # The fields mask can leave out 'items' entirely on an empty page
+            items = response.get('items', [])
+            batch_size = len(items)
+            logger.debug("Fetched batch of %d subscriptions", batch_size)
             
-            for item in response['items']:
-                sub_info = {
-                    'channel_name': item['snippet']['title'],
-                    'channel_id': item['snippet']['resourceId']['channelId'],
-                    'subscribed_at': item['snippet']['publishedAt']
+            all_subscriptions.extend(
+                {
+                    'channel_name': snippet['title'],
+                    'channel_id': snippet['resourceId']['channelId'],
+                    'subscribed_at': snippet['publishedAt']
                 }
-                all_subscriptions.append(sub_info)
+                for snippet in map(itemgetter('snippet'), items)
+            )
             
-            print(f"Fetched {len(all_subscriptions)} subscriptions so far...", end='\r')
+            # Only refresh the progress line every 10 pages
+            if quota_tracker.subscription_requests % 10 == 0:
+                print(f"Fetched {len(all_subscriptions)} subscriptions so far...", end='\r')
             
             next_page_token = response.get('nextPageToken')
             if not next_page_token:
@@ -202,21 +253,18 @@ def main():
         
         logger.info("Processing and saving results")
         print("\nSorting results...")
-        subs.sort(key=lambda x: x['subscribed_at'])
+        subs.sort(key=itemgetter('subscribed_at'))
         
         print("Saving to file...")
-        with open('my_subscriptions.json', 'w', encoding='utf-8') as f:
-            json.dump(subs, f, ensure_ascii=False, indent=2)
+        save_subscriptions(subs)
         
         logger.info(f"Successfully saved {len(subs)} subscriptions")
         print(f"\nSuccessfully saved {len(subs)} subscriptions!")
         
         print("\nYour 5 most recent subscriptions:")
         for sub in subs[-5:]:
-            sub_date = datetime.datetime.strptime(
-                sub['subscribed_at'], 
-                "%Y-%m-%dT%H:%M:%SZ"
-            ).strftime('%Y-%m-%d')
+            # subscribed_at is ISO 8601, so the date is its first 10 characters
+            sub_date = sub['subscribed_at'][:10]
             print(f"- {sub['channel_name']} (subscribed on {sub_date})")
         
         print("\nAll subscriptions have been saved to 'my_subscriptions.json'")
@@ -228,8 +276,7 @@ def main():
         if 'subs' in locals() and subs:
             logger.info("Saving partial results due to interruption")
             print("Saving partial results...")
-            with open('my_subscriptions.json', 'w', encoding='utf-8') as f:
-                json.dump(subs, f, ensure_ascii=False, indent=2)
+            save_subscriptions(subs)
             print(f"Saved {len(subs)} subscriptions to 'my_subscriptions.json'")
             quota_tracker.print_summary()
     except Exception as e: